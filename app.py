@@ -1,46 +1,28 @@
 import os
-from typing import List
 
-from save_db_utils import add_notion_db_page, write_notion_db_page
+from artifact_utils import JobArtifacts
+from index_utils import embed_paper, load_index, normalize_arxiv_id
+from save_db_utils import add_notion_db_page, get_arxiv_id, get_paper, write_notion_db_page
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
-from slack_sdk.errors import SlackApiError
+from slack_utils import SlackClient
 from summarize_utils import get_pdf_text, get_sections, load_pdf, make_xml_file, write_markdown
 
 # ボットトークンとソケットモードハンドラーを使ってアプリを初期化
 app = App(token=os.environ.get("SLACK_BOT_TOKEN"))
+slack = SlackClient(app.client)
 
-
-def get_thread_messages(channel_id: str, thread_ts: List[str]) -> List[dict]:
-    """
-    指定したチャンネルの指定したスレッドのメッセージを取得します．
-    Args:
-        channel_id: チャンネルID
-        thread_ts: スレッドのタイムスタンプ
-    Returns:
-        thread_messages: スレッドのメッセージ
-    """
-    try:
-        result = app.client.conversations_replies(
-            channel=channel_id,
-            ts=thread_ts,
-            limit=1000,
-        )
-        thread_messages = result["messages"]
-    except SlackApiError as e:
-        print(f"Error getting thread messages: {e}")
-
-    return thread_messages
+# 本棚に登録済みの論文のインデックス
+paper_index = load_index()
 
 
 @app.event("app_mention")
-def handle_app_mention_events(body, logger, say) -> None:
+def handle_app_mention_events(body, logger) -> None:
     """
     メンションされたときに発火して，Notionページに作成し，要約を書き込む
     Args:
         body: リクエストボディ
         logger: ロガー
-        say: メッセージを送信する関数
     """
     logger.info(body)
     bot_user_id = body["authorizations"][0]["user_id"]
@@ -50,51 +32,87 @@ def handle_app_mention_events(body, logger, say) -> None:
     channel_id = body["event"]["channel"]
     if "thread_ts" in body["event"].keys():
         thread_ts = body["event"]["thread_ts"]
-        thread_messages = get_thread_messages(channel_id, thread_ts)
+        thread_root = slack.get_thread_root(channel_id, thread_ts)
     else:
         thread_ts = body["event"]["ts"]
-        thread_messages = [body["event"]]
+        thread_root = body["event"]
 
     text = text.replace(f"<@{bot_user_id}>", "").strip()
     # デバック用
     if text == "ping":
-        say(text=f"<@{user}> pong :robot_face:", thread_ts=thread_ts)
+        slack.post_message(channel_id, f"<@{user}> pong :robot_face:", thread_ts=thread_ts)
     # 指定されたチャンネル以外は処理しない
     elif channel_id not in ["<channel id>"]:
-        say(text=f"<@{user}> this channel is not permitted", thread_ts=thread_ts)
+        slack.post_message(channel_id, f"<@{user}> this channel is not permitted", thread_ts=thread_ts)
+    # スレッドの親メッセージが取得できない場合は処理しない
+    elif thread_root is None:
+        slack.post_message(channel_id, f"<@{user}> failed to get the thread message", thread_ts=thread_ts)
 
     else:
-        # PDFファイルを取得
-        thread_text = thread_messages[0]["text"]
-        pdf_file_name, pdf_file_path = load_pdf(thread_text)
-
-        # セクション分割して，要約した文章を作成
-        root = make_xml_file(pdf_file_name)
-        sections = get_sections(root)
-        pdf_text = get_pdf_text(pdf_file_path)
-        markdown_text = write_markdown(sections, pdf_text.split(" "), pdf_file_name)
-
-        # for debug
-        # ここでtext類を保存する
-        with open("./tmp.txt", mode="w") as f:
-            f.write(thread_text)
-        with open("./tmp_markdown.txt", mode="w") as f:
-            f.write(markdown_text)
-
-        with open("./tmp.txt", mode="r") as f:
-            thread_text = f.read()
-        with open("./tmp_markdown.txt", mode="r") as f:
-            markdown_text = f.read()
-
-        # Notionにページを作成し，要約を書き込む
-        paper, database_id = add_notion_db_page(thread_text, is_debug=True)
+        thread_text = thread_root["text"]
+        arxiv_id = get_arxiv_id(thread_text)
+        # arXivの論文のスレッド以外は処理しない
+        if arxiv_id is None:
+            slack.post_message(channel_id, f"<@{user}> arXiv URL was not found in the thread", thread_ts=thread_ts)
+            return
+
+        # 関連論文を返信する(登録済みの論文はarXivに問い合わせずにインデックスから検索する)
+        if text == "related":
+            arxiv_id = normalize_arxiv_id(arxiv_id)
+            vector = paper_index.get_vector(arxiv_id)
+            if vector is None:
+                vector = embed_paper(get_paper(thread_text))
+            related_text = "\n".join(
+                f"- {meta['title']} ({meta['url']}) 類似度: {score:.2f}"
+                for meta, score in paper_index.related(arxiv_id, vector)
+            )
+            slack.post_message(
+                channel_id, f"<@{user}> 関連論文\n{related_text or '見つかりませんでした'}", thread_ts=thread_ts
+            )
+            return
+
+        # 登録済みまたは処理中の論文は処理しない
+        paper = get_paper(thread_text)
+        duplicate = paper_index.reserve(paper)
+        if duplicate is not None and duplicate.get("in_progress"):
+            slack.post_message(
+                channel_id,
+                f"<@{user}> already in progress: {duplicate['title']} ({duplicate['url']})",
+                thread_ts=thread_ts,
+            )
+            return
+        if duplicate is not None:
+            slack.post_message(
+                channel_id,
+                f"<@{user}> already registered: {duplicate['title']} ({duplicate['url']})",
+                thread_ts=thread_ts,
+            )
+            return
+
+        try:
+            # 中間生成物はジョブごとにメモリ上で保持し，終了時に破棄する
+            with JobArtifacts() as artifacts:
+                # PDFファイルを取得
+                pdf_file_name = load_pdf(paper, artifacts)
+
+                # セクション分割して，要約した文章を作成
+                root = make_xml_file(pdf_file_name, artifacts)
+                sections = get_sections(root)
+                pdf_text = get_pdf_text(artifacts)
+            markdown_text = write_markdown(sections, pdf_text.split(" "))
+
+            # Notionにページを作成
+            paper, database_id = add_notion_db_page(thread_text, paper=paper, is_debug=True)
+        except Exception:
+            paper_index.release(paper)
+            raise
+
+        # ページを作成した時点で登録済みとし，要約を書き込む
+        paper_index.add(paper)
         write_notion_db_page(markdown_text, paper, database_id, is_debug=True)
 
         # 要約をSlackのリプライに送信
-        say(
-            text=f"<@{user}>\n{markdown_text}",
-            thread_ts=thread_ts,
-        )
+        slack.post_message(channel_id, f"<@{user}>\n{markdown_text}", thread_ts=thread_ts)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,67 @@
+from tempfile import SpooledTemporaryFile
+from typing import BinaryIO, Dict
+
+# この大きさを超えた中間生成物だけをディスクに書き出す
+SPILL_THRESHOLD = 32 * 1024 * 1024
+
+
+class JobArtifacts:
+    def __init__(self, max_size: int = SPILL_THRESHOLD) -> None:
+        """
+        1ジョブ分の中間生成物(PDFなど)をメモリ上に保持するクラス
+        max_sizeを超えたものだけがジョブ専用の一時ファイルに退避される
+        Args:
+            max_size: ディスクに退避する閾値(バイト)
+        """
+        self.max_size = max_size
+        self._files: Dict[str, SpooledTemporaryFile] = {}
+
+    def __enter__(self) -> "JobArtifacts":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def create(self, name: str) -> BinaryIO:
+        """
+        書き込み用のバッファを作成
+        同名のバッファが既にあれば破棄して作り直す
+        Args:
+            name: 中間生成物の名前
+        Returns:
+            buffer: 書き込み用のバッファ
+        """
+        if name in self._files:
+            self._files[name].close()
+        self._files[name] = SpooledTemporaryFile(max_size=self.max_size)
+        return self._files[name]
+
+    def open(self, name: str) -> BinaryIO:
+        """
+        読み込み用に先頭へシークしたバッファを取得
+        Args:
+            name: 中間生成物の名前
+        Returns:
+            buffer: 読み込み用のバッファ
+        """
+        buffer = self._files[name]
+        buffer.seek(0)
+        return buffer
+
+    def read(self, name: str) -> bytes:
+        """
+        中間生成物をバイト列で取得
+        Args:
+            name: 中間生成物の名前
+        Returns:
+            data: 中間生成物のバイト列
+        """
+        return self.open(name).read()
+
+    def close(self) -> None:
+        """
+        全てのバッファを破棄(退避した一時ファイルも削除される)
+        """
+        for buffer in self._files.values():
+            buffer.close()
+        self._files.clear()
@@ -0,0 +1,137 @@
+import json
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qsl, urlparse
+
+
+class FakeSlackServer:
+    def __init__(self) -> None:
+        """
+        テスト用にSlack Web APIの一部を模したローカルサーバー
+        WebClient(base_url=server.base_url)として使う
+        """
+        self.messages = defaultdict(list)
+        self.calls = []
+        self._rate_limits = {}
+        self._ts = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/api/"
+
+    def __enter__(self) -> "FakeSlackServer":
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        # start()していない場合にshutdown()を呼ぶと終了しない
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+
+    def add_message(self, channel: str, text: str, thread_ts: Optional[str] = None) -> str:
+        """
+        メッセージを追加
+        Args:
+            channel: チャンネルID
+            text: メッセージ
+            thread_ts: 返信先のスレッドのタイムスタンプ
+        Returns:
+            ts: 追加したメッセージのタイムスタンプ
+        """
+        with self._lock:
+            self._ts += 1
+            ts = f"{self._ts}.000000"
+            message = {"type": "message", "text": text, "ts": ts, "thread_ts": thread_ts or ts}
+            self.messages[channel].append(message)
+        return ts
+
+    def rate_limit(self, method: str, count: int = 1, retry_after: int = 1) -> None:
+        """
+        指定したメソッドの次のcount回の呼び出しに429を返す
+        Args:
+            method: APIのメソッド名
+            count: 429を返す回数
+            retry_after: Retry-Afterの秒数
+        """
+        self._rate_limits[method] = (count, retry_after)
+
+    def handle(self, method: str, params: dict) -> dict:
+        """
+        APIの呼び出しを処理
+        Args:
+            method: APIのメソッド名
+            params: パラメータ
+        Returns:
+            body: レスポンスのボディ
+        """
+        if method == "chat.postMessage":
+            ts = self.add_message(params["channel"], params.get("text", ""), params.get("thread_ts"))
+            return {"ok": True, "channel": params["channel"], "ts": ts}
+
+        if method == "conversations.replies":
+            thread = [
+                message for message in self.messages[params["channel"]] if message["thread_ts"] == params["ts"]
+            ]
+            if len(thread) == 0:
+                return {"ok": False, "error": "thread_not_found"}
+            return {"ok": True, "messages": thread[: int(params.get("limit", 1000))]}
+
+        return {"ok": False, "error": "unknown_method"}
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self) -> None:
+                url = urlparse(self.path)
+                method = url.path.split("/")[-1]
+                params = dict(parse_qsl(url.query))
+                length = int(self.headers.get("Content-Length", 0))
+                if length > 0:
+                    body = self.rfile.read(length).decode("utf-8")
+                    if self.headers.get("Content-Type", "").startswith("application/json"):
+                        params.update(json.loads(body))
+                    else:
+                        params.update(parse_qsl(body))
+                fake.calls.append((method, params))
+
+                with fake._lock:
+                    count, retry_after = fake._rate_limits.get(method, (0, 0))
+                    if count > 0:
+                        fake._rate_limits[method] = (count - 1, retry_after)
+                if count > 0:
+                    status, headers = 429, {"Retry-After": str(retry_after)}
+                    body = {"ok": False, "error": "ratelimited"}
+                else:
+                    status, headers, body = 200, {}, fake.handle(method, params)
+
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = _respond
+            do_POST = _respond
+
+            def log_message(self, *args) -> None:
+                pass
+
+        return Handler
@@ -0,0 +1,291 @@
+import json
+import os
+import re
+import threading
+import zlib
+from typing import List, Optional, Tuple
+
+import arxiv
+import numpy as np
+import requests
+from save_db_utils import DATABASE_ID_DICT, get_database_pages
+from text_utils import tokenize
+
+# インデックスの保存先
+INDEX_DIR = "./index"
+VECTOR_FILE = "vectors.f32"
+META_FILE = "meta.jsonl"
+BACKFILL_MARKER = ".backfilled"
+
+# 埋め込みの次元数と重複とみなすコサイン類似度
+EMBEDDING_DIM = 2048
+ROW_SIZE = EMBEDDING_DIM * np.dtype(np.float32).itemsize
+DUPLICATE_THRESHOLD = 0.95
+
+
+def normalize_arxiv_id(url: str) -> str:
+    """
+    URLまたはIDからバージョンを除いたarXiv IDを取得
+    Args:
+        url: arXivのURLまたはID
+    Returns:
+        arxiv_id: arXiv ID
+    """
+    return re.sub(r"v\d+$", "", url.split("/abs/")[-1])
+
+
+def embed(text: str) -> np.ndarray:
+    """
+    単語と2単語の組をハッシュして，L2正規化した埋め込みを作成
+    Args:
+        text: テキスト
+    Returns:
+        vector: 埋め込み
+    """
+    words = tokenize(text)
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    idx = np.array([zlib.crc32(feature.encode("utf-8")) % EMBEDDING_DIM for feature in features], dtype=np.int64)
+    vector = np.log1p(np.bincount(idx, minlength=EMBEDDING_DIM)).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+def embed_paper(paper: arxiv.Result) -> np.ndarray:
+    """
+    論文のタイトルと概要から埋め込みを作成
+    Args:
+        paper: arXivの論文
+    Returns:
+        vector: 埋め込み
+    """
+    return embed(f"{paper.title} {paper.summary}")
+
+
+class PaperIndex:
+    def __init__(self, index_dir: str = INDEX_DIR) -> None:
+        """
+        本棚の論文の埋め込みをメモリマップで保持するインデックス
+        Args:
+            index_dir: インデックスの保存先
+        """
+        os.makedirs(index_dir, exist_ok=True)
+        self.vector_path = os.path.join(index_dir, VECTOR_FILE)
+        self.meta_path = os.path.join(index_dir, META_FILE)
+        self._lock = threading.Lock()
+        self._vectors = None
+        # 処理中の論文(arXiv ID -> 論文の情報)
+        self._reserved = {}
+
+        self.meta = []
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, mode="r") as f:
+                for line in f:
+                    try:
+                        self.meta.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # 書き込み途中で止まった行以降は使わない
+                        break
+        self.repair()
+        self._rows = {meta["id"]: i for i, meta in enumerate(self.meta)}
+
+    def repair(self) -> None:
+        """
+        埋め込みとメタ情報の件数がずれている場合(書き込み途中で停止した場合など)，短い方に揃える
+        """
+        vector_size = os.path.getsize(self.vector_path) if os.path.exists(self.vector_path) else 0
+        n = min(len(self.meta), vector_size // ROW_SIZE)
+        if vector_size != n * ROW_SIZE:
+            print(f"Truncating {self.vector_path} to {n} rows")
+            os.truncate(self.vector_path, n * ROW_SIZE)
+        if os.path.exists(self.meta_path) and os.path.getsize(self.meta_path) != len(self._dump_meta(self.meta[:n])):
+            print(f"Rewriting {self.meta_path} with {n} rows")
+            self.meta = self.meta[:n]
+            with open(self.meta_path, mode="wb") as f:
+                f.write(self._dump_meta(self.meta))
+
+    @staticmethod
+    def _dump_meta(meta_list: List[dict]) -> bytes:
+        return "".join(json.dumps(meta, ensure_ascii=False) + "\n" for meta in meta_list).encode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self.meta)
+
+    def __contains__(self, arxiv_id: str) -> bool:
+        return arxiv_id in self._rows
+
+    def get_vectors(self) -> np.ndarray:
+        """
+        埋め込みの行列をメモリマップで取得
+        Returns:
+            vectors: 埋め込みの行列 (論文数 x 次元数)
+        """
+        n = len(self.meta)
+        if n == 0:
+            return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        if self._vectors is None or len(self._vectors) != n:
+            self._vectors = np.memmap(self.vector_path, dtype=np.float32, mode="r", shape=(n, EMBEDDING_DIM))
+        return self._vectors
+
+    def get_vector(self, arxiv_id: str) -> Optional[np.ndarray]:
+        """
+        登録済みの論文の埋め込みを取得
+        Args:
+            arxiv_id: バージョンを除いたarXiv ID
+        Returns:
+            vector: 埋め込み．登録されていない場合はNone
+        """
+        if arxiv_id not in self._rows:
+            return None
+        return np.array(self.get_vectors()[self._rows[arxiv_id]])
+
+    def add(self, paper: arxiv.Result) -> None:
+        """
+        論文をインデックスに追記
+        Args:
+            paper: arXivの論文
+        """
+        self.add_entry(paper.entry_id, paper.title, paper.summary)
+
+    def add_entry(self, url: str, title: str, abstract: str) -> None:
+        """
+        論文のURL，タイトル，概要をインデックスに追記し，処理中の予約を解除
+        Args:
+            url: arXivのURL
+            title: タイトル
+            abstract: 概要
+        """
+        vector = embed(f"{title} {abstract}")
+        meta = {"id": normalize_arxiv_id(url), "title": title, "url": url}
+        with self._lock:
+            vector_size = len(self.meta) * ROW_SIZE
+            meta_size = os.path.getsize(self.meta_path) if os.path.exists(self.meta_path) else 0
+            try:
+                with open(self.vector_path, mode="ab") as f:
+                    f.write(vector.tobytes())
+                with open(self.meta_path, mode="ab") as f:
+                    f.write(self._dump_meta([meta]))
+            except Exception:
+                # 片方だけ書き込まれた状態を残さない
+                if os.path.exists(self.vector_path):
+                    os.truncate(self.vector_path, vector_size)
+                if os.path.exists(self.meta_path):
+                    os.truncate(self.meta_path, meta_size)
+                raise
+            self._rows[meta["id"]] = len(self.meta)
+            self.meta.append(meta)
+            self._reserved.pop(meta["id"], None)
+
+    def search(self, vector: np.ndarray, top_k: int = 5) -> List[Tuple[dict, float]]:
+        """
+        コサイン類似度の上位の論文を検索
+        Args:
+            vector: クエリの埋め込み
+            top_k: 取得する件数
+        Returns:
+            results: (論文の情報, 類似度)のリスト．類似度の降順
+        """
+        vectors = self.get_vectors()
+        if len(vectors) == 0:
+            return []
+
+        scores = vectors @ vector
+        top_k = min(top_k, len(scores))
+        idx = np.argpartition(-scores, top_k - 1)[:top_k]
+        idx = idx[np.argsort(-scores[idx])]
+        return [(self.meta[i], float(scores[i])) for i in idx]
+
+    def reserve(self, paper: arxiv.Result) -> Optional[dict]:
+        """
+        同じ論文(別バージョンや類似度の高いもの，処理中のものを含む)が無ければ処理中として予約
+        確認と予約は同時に行うため，並行して同じ論文を処理することは無い
+        Args:
+            paper: arXivの論文
+        Returns:
+            meta: 登録済みまたは処理中(in_progressがTrue)の論文の情報．予約できた場合はNone
+        """
+        arxiv_id = normalize_arxiv_id(paper.entry_id)
+        vector = embed_paper(paper)
+        with self._lock:
+            if arxiv_id in self._reserved:
+                return self._reserved[arxiv_id]
+            if arxiv_id in self._rows:
+                return self.meta[self._rows[arxiv_id]]
+
+            results = self.search(vector, top_k=1)
+            if len(results) > 0 and results[0][1] >= DUPLICATE_THRESHOLD:
+                return results[0][0]
+
+            self._reserved[arxiv_id] = {
+                "id": arxiv_id,
+                "title": paper.title,
+                "url": paper.entry_id,
+                "in_progress": True,
+            }
+            return None
+
+    def release(self, paper: arxiv.Result) -> None:
+        """
+        処理に失敗した論文の予約を解除
+        Args:
+            paper: arXivの論文
+        """
+        with self._lock:
+            self._reserved.pop(normalize_arxiv_id(paper.entry_id), None)
+
+    def related(self, arxiv_id: str, vector: np.ndarray, top_k: int = 5) -> List[Tuple[dict, float]]:
+        """
+        関連する論文を検索(論文自身は除く)
+        Args:
+            arxiv_id: バージョンを除いたarXiv ID
+            vector: 論文の埋め込み
+            top_k: 取得する件数
+        Returns:
+            results: (論文の情報, 類似度)のリスト．類似度の降順
+        """
+        results = self.search(vector, top_k=top_k + 1)
+        return [(meta, score) for meta, score in results if meta["id"] != arxiv_id][:top_k]
+
+
+def backfill_index(index: PaperIndex) -> bool:
+    """
+    Notionのデータベースに登録済みの論文をインデックスに追加
+    Args:
+        index: インデックス
+    Returns:
+        is_completed: 全てのデータベースを取り込めたかどうか
+    """
+    is_completed = True
+    for database_id in DATABASE_ID_DICT.values():
+        try:
+            pages = get_database_pages(database_id)
+        except requests.RequestException as e:
+            print(f"Error getting database pages: {e}")
+            is_completed = False
+            continue
+
+        for page in pages:
+            properties = page["properties"]
+            url = properties["URL"]["url"]
+            if not url or normalize_arxiv_id(url) in index:
+                continue
+            title = "".join(text["plain_text"] for text in properties["Name"]["title"])
+            abstract = "".join(text["plain_text"] for text in properties["Abstract"]["rich_text"])
+            index.add_entry(url, title, abstract)
+    return is_completed
+
+
+def load_index(index_dir: str = INDEX_DIR) -> PaperIndex:
+    """
+    インデックスを読み込む．Notionのデータベースを取り込み終えるまでは起動時に取り込む
+    Args:
+        index_dir: インデックスの保存先
+    Returns:
+        index: インデックス
+    """
+    index = PaperIndex(index_dir)
+    marker_path = os.path.join(index_dir, BACKFILL_MARKER)
+    if not os.path.exists(marker_path) and backfill_index(index):
+        open(marker_path, mode="w").close()
+    return index
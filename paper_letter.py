@@ -1,12 +1,15 @@
 import datetime as dt
 import os
 import time
-from typing import Set
+from collections import Counter
+from typing import List, Set, Tuple
 
 import arxiv
+import numpy as np
 import openai
 from slack_sdk import WebClient
-from slack_sdk.errors import SlackApiError
+from slack_utils import SlackClient
+from text_utils import tokenize
 
 # OpenAIのAPIキーを設定
 openai.api_key = os.environ.get("OPENAI_KEY")
@@ -18,7 +21,7 @@ SLACK_API_TOKEN = os.environ.get("SLACK_API_TOKEN")
 SLACK_CHANNEL = "#<チャンネル名>"
 
 # Slack APIクライアントを初期化する
-client = WebClient(token=SLACK_API_TOKEN)
+client = SlackClient(WebClient(token=SLACK_API_TOKEN))
 
 # queryを用意
 QUERY_TEMPLATE = "%28 ti:%22{}%22 OR abs:%22{}%22 %29 AND submittedDate: [{} TO {}]"
@@ -28,6 +31,11 @@ CATEGORIES = {
     "<カテゴリーラベル>",
 }
 
+# チームの興味関心(ランキングでキーワードと合わせて使う)
+INTEREST_PROFILE = """
+<チームが興味を持っているトピックを英語で列挙>
+"""
+
 SYSTEM = """
 ### 指示 ###
 論文の内容を理解した上で，重要なポイントを箇条書きで3点書いてください。
@@ -52,8 +60,48 @@ SYSTEM = """
 MODEL_NAME = "gpt-3.5-turbo"
 TEMPERATURE = 0.25
 MAX_RESULT = 10
+N_CANDIDATES = 100
 N_DAYS = 1
 
+# BM25のパラメータ
+BM25_K1 = 1.5
+BM25_B = 0.75
+KEYWORD_WEIGHT = 2.0
+
+
+def rank_results(result_list: List[arxiv.Result], keyword: str) -> List[Tuple[arxiv.Result, float]]:
+    """
+    キーワードとチームの興味関心に対するBM25スコアで論文を並べ替え
+    Args:
+        result_list: arXivの検索結果のリスト
+        keyword: 検索キーワード
+    Returns:
+        ranked_list: (論文, スコア)のリスト．スコアの降順で，同点の場合は元の順序を保つ
+    """
+    if len(result_list) == 0:
+        return []
+
+    # クエリの単語ごとの重み(キーワードを興味関心より重視する)
+    query_weights = Counter(tokenize(INTEREST_PROFILE))
+    for token in tokenize(keyword):
+        query_weights[token] += KEYWORD_WEIGHT
+    terms = list(query_weights)
+    weights = np.array([query_weights[term] for term in terms], dtype=np.float64)
+
+    # タイトルと概要の単語頻度行列 (論文数 x クエリの単語数)
+    docs = [Counter(tokenize(f"{result.title} {result.summary}")) for result in result_list]
+    tf = np.array([[doc[term] for term in terms] for doc in docs], dtype=np.float64).reshape(len(docs), len(terms))
+    doc_len = np.array([sum(doc.values()) for doc in docs], dtype=np.float64)
+    avg_len = max(doc_len.mean(), 1.0)
+
+    df = (tf > 0).sum(axis=0)
+    idf = np.log((len(docs) - df + 0.5) / (df + 0.5) + 1.0)
+    norm = BM25_K1 * (1.0 - BM25_B + BM25_B * doc_len / avg_len)
+    scores = (tf * (BM25_K1 + 1.0) / (tf + norm[:, None])) @ (idf * weights)
+
+    order = np.argsort(-scores, kind="stable")
+    return [(result_list[i], float(scores[i])) for i in order]
+
 
 def get_summary(result: arxiv.Result) -> str:
     """
@@ -108,13 +156,13 @@ def job(keyword: str, paper_hash: Set[str], is_debug: bool = False) -> Set[str]:
     query = QUERY_TEMPLATE.format(keyword, keyword, base_date.strftime("%Y%m%d%H%M%S"), today.strftime("%Y%m%d%H%M%S"))
     search = arxiv.Search(
         query=query,  # 検索クエリ
-        max_results=MAX_RESULT * 3,  # 取得する論文数の上限
+        max_results=N_CANDIDATES,  # 取得する論文数の上限
         sort_by=arxiv.SortCriterion.SubmittedDate,  # 論文を投稿された日付でソートする
         sort_order=arxiv.SortOrder.Descending,  # 新しい論文から順に取得する
     )
 
-    # searchの結果をリストに格納
-    result_list = []
+    # searchの結果を候補としてリストに格納
+    candidate_list = []
     for result in search.results():
         # 既に投稿済みの論文は除く
         if result.title in paper_hash:
@@ -122,44 +170,44 @@ def job(keyword: str, paper_hash: Set[str], is_debug: bool = False) -> Set[str]:
         # カテゴリーに含まれない論文は除く
         if len((set(result.categories) & CATEGORIES)) == 0:
             continue
+        candidate_list.append(result)
 
-        if is_debug:
+    # 要約する前に手元でランキングして，上位の論文だけを残す
+    result_list = rank_results(candidate_list, keyword)[:MAX_RESULT]
+    if is_debug:
+        for result, score in result_list:
             print(result.published)
             print(result.title)
-        result_list.append(result)
-        paper_hash.add(result.title)
+            print(score)
 
-        # 最大件数に到達した場合は，そこで打ち止め
-        if len(result_list) == MAX_RESULT:
-            break
+    # 論文ごとに要約する(失敗した論文は投稿せずに，後続のキーワードで再度候補にする)
+    summary_list = []
+    for result, score in result_list:
+        try:
+            summary_list.append((result, score, get_summary(result)))
+        except Exception as e:
+            print(f"Error summarizing paper: {e}")
 
-    if len(result_list) == 0:
+    if len(summary_list) == 0:
         # 初期メッセージ
-        response = client.chat_postMessage(
-            channel=SLACK_CHANNEL,
-            text=f"{'=' * 40}\n{keyword}に関する論文は有りませんでした！\n{'=' * 40}",
+        client.post_message(
+            SLACK_CHANNEL,
+            f"{'=' * 40}\n{keyword}に関する論文は有りませんでした！\n{'=' * 40}",
         )
         return paper_hash
-    else:
-        # 初期メッセージ
-        response = client.chat_postMessage(
-            channel=SLACK_CHANNEL,
-            text=f"{'=' * 40}\n{keyword}に関する論文は{len(result_list)}本ありました！\n{'=' * 40}",
-        )
 
-    # 論文情報をSlackに投稿する
-    for i, result in enumerate(result_list, start=1):
-        try:
-            # Slackに投稿するメッセージを組み立てる
-            message = f"{keyword}: {i}本目\n" + get_summary(result)
+    # 初期メッセージと論文情報をまとめて組み立てる
+    messages = [f"{'=' * 40}\n{keyword}に関する論文を{len(summary_list)}本要約しました！\n{'=' * 40}"]
+    for i, (result, score, summary) in enumerate(summary_list, start=1):
+        messages.append(f"{keyword}: {i}本目 (スコア: {score:.2f})\n" + summary)
 
-            # Slackにメッセージを投稿する
-            response = client.chat_postMessage(channel=SLACK_CHANNEL, text=message)
-            print(f"Message posted: {response['ts']}")
+    # Slackに投稿する(間隔はRate Limitに合わせてSlackClientが調整する)
+    ts_list = client.post_messages(SLACK_CHANNEL, messages)
 
-        except SlackApiError as e:
-            print(f"Error posting message: {e}")
-        time.sleep(10)
+    # 投稿できた論文だけを投稿済みにする
+    for (result, _, _), ts in zip(summary_list, ts_list[1:]):
+        if ts is not None:
+            paper_hash.add(result.title)
 
     return paper_hash
 
@@ -1,5 +1,5 @@
 import os
-from typing import Tuple
+from typing import List, Optional, Tuple
 
 import arxiv
 import requests
@@ -74,6 +74,23 @@ PROPERTIES = {
 CREATE_URL = "https://api.notion.com/v1/pages"
 
 
+def get_arxiv_id(text: str) -> Optional[str]:
+    """
+    テキストからarXiv IDを取得
+    Args:
+        text: テキスト
+    Returns:
+        arxiv_id: arXiv ID．3行目にarXivのURLが無い場合はNone
+    """
+    lines = text.split("\n")
+    if len(lines) < 3 or "arxiv.org/" not in lines[2]:
+        return None
+    arxiv_id = lines[2].split("/")[-1]
+    if arxiv_id[-1] == ">":
+        arxiv_id = arxiv_id[:-1]
+    return arxiv_id
+
+
 def get_paper(text: str) -> arxiv.Result:
     """
     テキストからarXivの論文を取得
@@ -82,9 +99,7 @@ def get_paper(text: str) -> arxiv.Result:
     returns:
         paper: arXivの論文
     """
-    arxiv_id = text.split("\n")[2].split("/")[-1]
-    if arxiv_id[-1] == ">":
-        arxiv_id = arxiv_id[:-1]
+    arxiv_id = get_arxiv_id(text)
     paper = next(arxiv.Search(id_list=[arxiv_id]).results())
     return paper
 
@@ -165,6 +180,28 @@ def get_page_id(title: str, database_id: str) -> str:
     return page_id
 
 
+def get_database_pages(database_id: str) -> List[dict]:
+    """
+    データベースの全てのページを取得
+    Args:
+        database_id: データベースID
+    Returns:
+        pages: ページのリスト
+    """
+    url = f"https://api.notion.com/v1/databases/{database_id}/query"
+    payload = {"page_size": 100}
+    pages = []
+    while True:
+        response = requests.post(url, json=payload, headers=HEADERS, timeout=30)
+        response.raise_for_status()
+        result = response.json()
+        pages += result["results"]
+        if not result["has_more"]:
+            break
+        payload["start_cursor"] = result["next_cursor"]
+    return pages
+
+
 def write_to_notion_page(markdown_text: str, paper: arxiv.Result, page_id: str, is_debug: bool = False) -> None:
     """
     Notionのページに書き込み
@@ -201,17 +238,21 @@ def write_to_notion_page(markdown_text: str, paper: arxiv.Result, page_id: str,
         assert response.status_code == 200, f"{response.content}"
 
 
-def add_notion_db_page(text: str, is_debug: bool = False) -> Tuple[arxiv.Result, str]:
+def add_notion_db_page(
+    text: str, paper: Optional[arxiv.Result] = None, is_debug: bool = False
+) -> Tuple[arxiv.Result, str]:
     """
     テキストからNotionのページを作成
     Args:
         text: テキスト
+        paper: arXivの論文．Noneの場合はテキストから取得する
         is_debug: デバッグモード
     Returns:
         paper: arXivの論文
         database_id: データベースID
     """
-    paper = get_paper(text)
+    if paper is None:
+        paper = get_paper(text)
     summary = get_summary(text)
     database_id = get_database_id(text)
     create_page(paper, summary, database_id, is_debug=is_debug)
@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
+from slack_sdk.http_retry.builtin_handlers import RateLimitErrorRetryHandler
+
+# メソッドごとの最小呼び出し間隔(秒)．SlackのRate Limitのティアに合わせる
+TIER_INTERVALS = {
+    "chat.postMessage": 1.0,  # Special: 1チャンネルあたり1秒に1件
+    "conversations.replies": 60 / 50,  # Tier 3: 1分あたり50回
+}
+
+# 429が返ってきた場合に，Retry-Afterだけ待って再試行する回数
+MAX_RETRY = 3
+
+# スレッドの親メッセージのキャッシュ(LRU)
+THREAD_CACHE_TTL = 300
+THREAD_CACHE_SIZE = 128
+
+
+class SlackClient:
+    def __init__(self, client: WebClient) -> None:
+        """
+        Rate Limitを考慮してSlack APIを呼び出すクラス
+        Args:
+            client: SlackのWebClient
+        """
+        self.client = client
+        if not any(isinstance(handler, RateLimitErrorRetryHandler) for handler in client.retry_handlers):
+            client.retry_handlers.append(RateLimitErrorRetryHandler(max_retry_count=MAX_RETRY))
+
+        self._lock = threading.Lock()
+        self._last_called = {}
+        self._thread_roots: "OrderedDict[Tuple[str, str], Tuple[float, dict]]" = OrderedDict()
+
+    def _wait(self, method: str, channel: Optional[str] = None) -> None:
+        """
+        ティアの間隔を空けてからAPIを呼び出すために待機
+        Args:
+            method: APIのメソッド名
+            channel: チャンネルごとに制限されるメソッドの場合はチャンネル
+        """
+        interval = TIER_INTERVALS.get(method, 0.0)
+        key = (method, channel)
+        with self._lock:
+            now = time.monotonic()
+            called_at = max(self._last_called.get(key, now - interval) + interval, now)
+            self._last_called[key] = called_at
+        if called_at > now:
+            time.sleep(called_at - now)
+
+    def get_thread_root(self, channel_id: str, thread_ts: str) -> Optional[dict]:
+        """
+        指定したチャンネルの指定したスレッドの親メッセージを取得します．
+        Args:
+            channel_id: チャンネルID
+            thread_ts: スレッドのタイムスタンプ
+        Returns:
+            message: スレッドの親メッセージ．取得できなかった場合はNone
+        """
+        key = (channel_id, thread_ts)
+        with self._lock:
+            if key in self._thread_roots:
+                expires_at, message = self._thread_roots[key]
+                if expires_at > time.monotonic():
+                    self._thread_roots.move_to_end(key)
+                    return message
+                del self._thread_roots[key]
+
+        self._wait("conversations.replies")
+        try:
+            result = self.client.conversations_replies(channel=channel_id, ts=thread_ts, limit=1)
+        except SlackApiError as e:
+            print(f"Error getting thread messages: {e}")
+            return None
+        if len(result["messages"]) == 0:
+            return None
+        message = result["messages"][0]
+
+        with self._lock:
+            self._thread_roots[key] = (time.monotonic() + THREAD_CACHE_TTL, message)
+            if len(self._thread_roots) > THREAD_CACHE_SIZE:
+                self._thread_roots.popitem(last=False)
+        return message
+
+    def post_message(self, channel: str, text: str, thread_ts: Optional[str] = None) -> Optional[str]:
+        """
+        メッセージを投稿
+        Args:
+            channel: チャンネル
+            text: メッセージ
+            thread_ts: 返信先のスレッドのタイムスタンプ
+        Returns:
+            ts: 投稿したメッセージのタイムスタンプ．失敗した場合はNone
+        """
+        self._wait("chat.postMessage", channel)
+        try:
+            response = self.client.chat_postMessage(channel=channel, text=text, thread_ts=thread_ts)
+        except SlackApiError as e:
+            print(f"Error posting message: {e}")
+            return None
+        print(f"Message posted: {response['ts']}")
+        return response["ts"]
+
+    def post_messages(self, channel: str, texts: List[str]) -> List[Optional[str]]:
+        """
+        複数のメッセージを順番に投稿
+        Args:
+            channel: チャンネル
+            texts: メッセージのリスト
+        Returns:
+            ts_list: 投稿したメッセージのタイムスタンプのリスト
+        """
+        return [self.post_message(channel, text) for text in texts]
@@ -1,24 +1,29 @@
 import os
-import subprocess
 import xml.etree.ElementTree as ET
-from pathlib import Path
-from typing import List, Tuple
+from typing import List
 from xml.etree.ElementTree import Element
 
 import arxiv
 import fitz
 import openai
+import requests
+from artifact_utils import JobArtifacts
 from tqdm.auto import tqdm
 from transformers import pipeline
 
-# フォルダの作成
-os.makedirs("./pdf", exist_ok=True)
-os.makedirs("./xml", exist_ok=True)
-os.makedirs("./pdf_images", exist_ok=True)
-
 # OpenAIのAPIキーを設定
 openai.api_key = os.environ.get("OPENAI_KEY")
 
+# GROBIDサーバーのURL
+GROBID_URL = os.environ.get("GROBID_URL", "http://localhost:8070")
+
+# タイムアウト(接続, 読み込み)の秒数
+PDF_TIMEOUT = (10, 120)
+GROBID_TIMEOUT = (10, 300)
+
+# 中間生成物の名前
+PDF_ARTIFACT = "paper.pdf"
+
 MODEL_NAME = "gpt-3.5-turbo"
 TEMPERATURE = 0.25
 SYSTEM = """
@@ -69,48 +74,46 @@ class Section:
         self.body = body
 
 
-def load_pdf(text: str) -> Tuple[str, str]:
+def load_pdf(paper: arxiv.Result, artifacts: JobArtifacts) -> str:
     """
-    テキストからarXivの論文を取得
+    arXivの論文のPDFをメモリ上に読み込む
     Args:
-        text: テキスト
+        paper: arXivの論文
+        artifacts: ジョブの中間生成物
     Returns:
         pdf_file_name: PDFファイル名
-        pdf_file_path: PDFファイルパス
     """
-    arxiv_id = text.split("\n")[2].split("/")[-1]
-    if arxiv_id[-1] == ">":
-        arxiv_id = arxiv_id[:-1]
-
-    paper = next(arxiv.Search(id_list=[arxiv_id]).results())
     pdf_file_name = paper.title.replace(" ", "_")
 
-    os.makedirs(f"./pdf/{pdf_file_name}", exist_ok=True)
-    pdf_file_path = paper.download_pdf(dirpath=f"./pdf/{pdf_file_name}", filename=f"{pdf_file_name}.pdf")
-    return pdf_file_name, pdf_file_path
+    with requests.get(paper.pdf_url, stream=True, timeout=PDF_TIMEOUT) as response:
+        response.raise_for_status()
+        buffer = artifacts.create(PDF_ARTIFACT)
+        for chunk in response.iter_content(chunk_size=1024 * 1024):
+            buffer.write(chunk)
+    return pdf_file_name
 
 
-def make_xml_file(pdf_file_name: str, is_debug: bool = False) -> Element:
+def make_xml_file(pdf_file_name: str, artifacts: JobArtifacts, is_debug: bool = False) -> Element:
     """
-    PDFファイルからXMLファイルを作成
+    PDFをGROBIDサーバーに送り，XMLを作成
+    requestsはmultipartのボディを作る際にPDF全体をメモリに読み込む
     Args:
         pdf_file_name: PDFファイル名
+        artifacts: ジョブの中間生成物
         is_debug: デバッグモード
     Returns:
         root: XMLのルート
     """
-    # /path/toの部分を書き換えてください
-    cp = subprocess.run(
-        f"java -Xmx4G -jar /path/to/grobid/grobid-0.7.2/grobid-core/build/libs/grobid-core-0.7.2-onejar.jar -gH /path/to/grobid/grobid-0.7.2/grobid-home -dIn /path/to/pdf/{pdf_file_name}/ -dOut /path/to/xml -exe processFullText",
-        shell=True,
+    response = requests.post(
+        f"{GROBID_URL}/api/processFulltextDocument",
+        files={"input": (f"{pdf_file_name}.pdf", artifacts.open(PDF_ARTIFACT), "application/pdf")},
+        timeout=GROBID_TIMEOUT,
     )
     if is_debug:
-        print(f"return code = {cp.returncode}")
+        print(f"status code = {response.status_code}")
+    response.raise_for_status()
 
-    file_name = os.path.splitext(pdf_file_name)[0]
-    xml_path = f"./xml/{file_name}.tei.xml"
-    tree = ET.parse(xml_path)
-    root = tree.getroot()
+    root = ET.fromstring(response.content)
     return root
 
 
@@ -137,15 +140,16 @@ def get_sections(root: Element) -> List[Section]:
     return sections
 
 
-def get_pdf_text(pdf_file_path: str) -> str:
+def get_pdf_text(artifacts: JobArtifacts) -> str:
     """
-    PDFファイルからテキストを取得
+    PDFからテキストを取得
+    fitzはバイト列から開くため，ディスクに退避済みのPDFもこの間は全体をメモリに読み込む
     Args:
-        pdf_file_path: PDFファイルパス
+        artifacts: ジョブの中間生成物
     Returns:
         pdf_text: PDFのテキスト
     """
-    with fitz.open(pdf_file_path) as pdf_in:
+    with fitz.open(stream=artifacts.read(PDF_ARTIFACT), filetype="pdf") as pdf_in:
         pdf_text = ""
         for page in pdf_in:
             page1 = page.get_text()
@@ -185,20 +189,17 @@ def get_prefix(start: int, section: str, pdf_text_list: str) -> str:
     return start, prefix
 
 
-def write_markdown(sections: List[str], pdf_text_list: str, pdf_file_name: str) -> str:
+def write_markdown(sections: List[str], pdf_text_list: str) -> str:
     """
-    Markdownファイルを作成
+    Markdownのテキストを作成
     Args:
         sections: セクションのリスト
         pdf_text_list: PDFのテキストのリスト
-        pdf_file_name: PDFファイル名
     Returns:
         markdown_text: Markdownのテキスト
     """
     summarizer = pipeline("summarization", model="kworts/BARTxiv")
     translator = pipeline("translation", model="staka/fugumt-en-ja")
-    img_dir = Path(".") / "xml" / f"{pdf_file_name}_assets"
-    assert img_dir.exists(), f"{img_dir}"
 
     markdown_text = ""
     start = 0
@@ -228,9 +229,6 @@ def write_markdown(sections: List[str], pdf_text_list: str, pdf_file_name: str)
 
         if "conclusion" in section.title.lower():
             # *NOTE: 一旦画像は追加しない
-            # path_list = sorted([tmp for tmp in img_dir.glob("*") if tmp.stem.split("image-")[-1].isdigit()], key=lambda x: int(x.stem.split("image-")[-1]))
-            # for path in path_list:
-            #     markdown_text += "\n\n" + f"<img alt='image' src={path} width=100>"
             break
 
     return markdown_text
@@ -0,0 +1,48 @@
+import time
+
+import pytest
+from fake_slack import FakeSlackServer
+from slack_sdk import WebClient
+from slack_utils import SlackClient
+
+
+@pytest.fixture
+def fake():
+    with FakeSlackServer() as server:
+        yield server
+
+
+@pytest.fixture
+def slack(fake):
+    return SlackClient(WebClient(token="xoxb-test", base_url=fake.base_url))
+
+
+def count_calls(fake, method):
+    return len([name for name, _ in fake.calls if name == method])
+
+
+def test_thread_root_is_cached(fake, slack):
+    thread_ts = fake.add_message("C1", "root")
+    fake.add_message("C1", "reply", thread_ts=thread_ts)
+
+    assert slack.get_thread_root("C1", thread_ts)["text"] == "root"
+    assert slack.get_thread_root("C1", thread_ts)["text"] == "root"
+    assert count_calls(fake, "conversations.replies") == 1
+
+
+def test_rate_limited_call_is_retried_after_retry_after(fake, slack):
+    thread_ts = fake.add_message("C1", "root")
+    fake.rate_limit("conversations.replies", count=1, retry_after=1)
+
+    start = time.monotonic()
+    assert slack.get_thread_root("C1", thread_ts)["text"] == "root"
+    assert time.monotonic() - start >= 1
+    assert count_calls(fake, "conversations.replies") == 2
+
+
+def test_slack_error_returns_none(fake, slack):
+    assert slack.get_thread_root("C1", "999.000000") is None
+
+
+def test_stop_without_start_does_not_block():
+    FakeSlackServer().stop()
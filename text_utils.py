@@ -0,0 +1,14 @@
+import re
+from typing import List
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    英文を小文字の単語列に分割
+    論文のランキングとインデックスで同じ分割を使う
+    Args:
+        text: テキスト
+    Returns:
+        tokens: 単語のリスト
+    """
+    return re.findall(r"[a-z0-9]+", text.lower())